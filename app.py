@@ -7,8 +7,8 @@ Backend API Server with SSH/Telnet/Console support
 from flask import Flask, request, jsonify, send_file
 from flask_cors import CORS
 import paramiko
-import telnetlib
 import io
+import re
 import threading
 import time
 import json
@@ -16,6 +16,10 @@ import logging
 from datetime import datetime
 import os
 
+from session_logs import get_session_log_writer, list_session_logs
+from telnet_transport import TelnetTransport
+from trigger_capture import TriggerCapture
+
 logging.basicConfig(
     level=logging.DEBUG,
     format='%(asctime)s [%(levelname)s] %(name)s - %(message)s'
@@ -260,6 +264,8 @@ class FortiGateConnection:
         self.is_monitoring = False
         self.monitor_thread = None
         self.current_output_id = None
+        self.trigger = None
+        self.log_id = None
         
     def connect_ssh(self):
         """Establish an SSH connection"""
@@ -291,12 +297,12 @@ class FortiGateConnection:
         """Establish a Telnet connection"""
         try:
             logger.debug("Initializing Telnet client for %s:%s", self.host, self.port)
-            self.client = telnetlib.Telnet(self.host, self.port, timeout=10)
+            self.client = TelnetTransport(self.host, self.port, timeout=10)
             # Wait for login prompts
             self.client.read_until(b"login: ", timeout=5)
-            self.client.write(self.username.encode('ascii') + b"\n")
+            self.client.write(self.username + "\n")
             self.client.read_until(b"Password: ", timeout=5)
-            self.client.write(self.password.encode('ascii') + b"\n")
+            self.client.write(self.password + "\n")
             time.sleep(1)
             return True, "Telnet connection successful"
         except Exception as e:
@@ -307,13 +313,24 @@ class FortiGateConnection:
         """Create a connection using the configured protocol"""
         if self.connection_type == 'ssh':
             logger.info("Attempting SSH connection to %s:%s", self.host, self.port)
-            return self.connect_ssh()
+            success, message = self.connect_ssh()
         elif self.connection_type == 'telnet':
             logger.info("Attempting Telnet connection to %s:%s", self.host, self.port)
-            return self.connect_telnet()
+            success, message = self.connect_telnet()
         else:
             return False, "Unsupported connection type"
 
+        if success:
+            self.log_id = get_session_log_writer().open(
+                f"{self.host}_{self.connection_type}_{datetime.now().strftime('%Y%m%d-%H%M%S')}",
+                f"{self.connection_type.upper()} Connection: {self.username}@{self.host}:{self.port}"
+            )
+        return success, message
+
+    def _log(self, data):
+        if self.log_id and data:
+            get_session_log_writer().write(self.log_id, data)
+
     def send_command(self, command, wait_time=1):
         """Send a command over the active connection"""
         try:
@@ -324,12 +341,15 @@ class FortiGateConnection:
                 output = ""
                 while self.shell.recv_ready():
                     output += self.shell.recv(65535).decode('utf-8', errors='ignore')
+                self._log(output)
                 return output
             elif self.connection_type == 'telnet':
                 logger.debug("Sending Telnet command: %s", command)
-                self.client.write(command.encode('ascii') + b"\n")
+                self.client.write(command + "\n")
                 time.sleep(wait_time)
-                return self.client.read_very_eager().decode('utf-8', errors='ignore')
+                output = self.client.read_text()
+                self._log(output)
+                return output
         except Exception as e:
             logger.exception("Command execution error on %s via %s", self.host, self.connection_type)
             return f"Command execution error: {str(e)}"
@@ -361,31 +381,45 @@ class FortiGateConnection:
 
         return True, f"Started monitoring {mode_name}"
 
+    def _ingest(self, data):
+        """Timestamp a chunk of device output and route it to storage"""
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+        formatted = f"[{timestamp}] {data}"
+        if self.trigger:
+            self.trigger.feed(formatted, data)
+            return
+        self._log(data)
+        self.output_buffer.append(formatted)
+        if self.current_output_id and self.current_output_id in debug_outputs:
+            debug_outputs[self.current_output_id]['output'].append(formatted)
+
     def _monitor_output(self):
         """Background thread to collect device output"""
-        while self.is_monitoring:
-            try:
-                if self.connection_type == 'ssh' and self.shell.recv_ready():
-                    data = self.shell.recv(65535).decode('utf-8', errors='ignore')
-                    if data:
-                        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                        formatted = f"[{timestamp}] {data}"
-                        self.output_buffer.append(formatted)
-                        if self.current_output_id and self.current_output_id in debug_outputs:
-                            debug_outputs[self.current_output_id]['output'].append(formatted)
-                elif self.connection_type == 'telnet':
-                    data = self.client.read_very_eager().decode('utf-8', errors='ignore')
-                    if data:
-                        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-                        formatted = f"[{timestamp}] {data}"
-                        self.output_buffer.append(formatted)
-                        if self.current_output_id and self.current_output_id in debug_outputs:
-                            debug_outputs[self.current_output_id]['output'].append(formatted)
-                time.sleep(0.1)
-            except Exception as e:
-                logger.exception("Monitoring thread error for %s", self.host)
-                self.output_buffer.append(f"Monitoring error: {str(e)}")
-                break
+        try:
+            while self.is_monitoring:
+                try:
+                    if self.connection_type == 'ssh':
+                        if self.shell.recv_ready():
+                            data = self.shell.recv(65535).decode('utf-8', errors='ignore')
+                            if data:
+                                self._ingest(data)
+                        time.sleep(0.1)
+                    elif self.connection_type == 'telnet':
+                        # Waits on socket readiness, so output is picked up as soon as it arrives
+                        data = self.client.read_text(timeout=0.1)
+                        if data:
+                            self._ingest(data)
+                    if self.trigger:
+                        self.trigger.poll()
+                except Exception as e:
+                    logger.exception("Monitoring thread error for %s", self.host)
+                    self.output_buffer.append(f"Monitoring error: {str(e)}")
+                    break
+        finally:
+            # Poll will not run again, so save a post-trigger window still open
+            # (e.g. the device dropped the link mid-window)
+            if self.trigger:
+                self.trigger.flush()
 
     def stop_debug_monitoring(self, debug_mode, stop_commands=None):
         """Stop debug monitoring for the selected mode"""
@@ -405,10 +439,15 @@ class FortiGateConnection:
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
 
+        if self.trigger:
+            self.trigger.flush()
+
         return True, "Monitoring stopped"
 
     def get_output(self):
         """Return a copy of the current output buffer"""
+        if self.trigger:
+            return self.trigger.get_output()
         output = self.output_buffer.copy()
         return output
 
@@ -421,12 +460,19 @@ class FortiGateConnection:
         self.is_monitoring = False
         if self.monitor_thread:
             self.monitor_thread.join(timeout=2)
+
+        if self.trigger:
+            self.trigger.flush()
         
         if self.connection_type == 'ssh' and self.client:
             self.client.close()
         elif self.connection_type == 'telnet' and self.client:
             self.client.close()
 
+        if self.log_id:
+            get_session_log_writer().close(self.log_id, f"[Session closed at {datetime.now()}]")
+            self.log_id = None
+
 
 @app.route('/api/debug-modes', methods=['GET'])
 def get_debug_modes():
@@ -489,6 +535,7 @@ def start_debug():
     debug_mode = data.get('debug_mode')
     custom_commands = data.get('custom_commands')
     custom_stop_commands = data.get('custom_stop_commands')
+    trigger_config = data.get('trigger')
 
     def _parse_commands(cmds):
         if not cmds:
@@ -504,6 +551,13 @@ def start_debug():
 
     conn = active_sessions[session_id]
     output_id = f"{session_id}_{debug_mode}_{int(time.time())}"
+
+    trigger = None
+    if trigger_config:
+        try:
+            trigger = TriggerCapture.from_config(output_id, trigger_config)
+        except (re.error, TypeError, ValueError) as e:
+            return jsonify({'success': False, 'message': f'Invalid trigger: {str(e)}'}), 400
     logger.info("Starting debug", extra={'session_id': session_id, 'debug_mode': debug_mode, 'output_id': output_id})
     parsed_custom_commands = _parse_commands(custom_commands)
     parsed_custom_stop_commands = _parse_commands(custom_stop_commands)
@@ -514,10 +568,12 @@ def start_debug():
         'start_time': datetime.now().isoformat(),
         'output': [],
         'start_commands': parsed_custom_commands if debug_mode == 'custom' else DEBUG_MODES.get(debug_mode, {}).get('commands', []),
-        'stop_commands': parsed_custom_stop_commands if debug_mode == 'custom' else DEBUG_MODES.get(debug_mode, {}).get('stop_commands', [])
+        'stop_commands': parsed_custom_stop_commands if debug_mode == 'custom' else DEBUG_MODES.get(debug_mode, {}).get('stop_commands', []),
+        'trigger': trigger_config if trigger else None
     }
 
     conn.current_output_id = output_id
+    conn.trigger = trigger
 
     if debug_mode == 'custom':
         if not parsed_custom_commands:
@@ -534,6 +590,7 @@ def start_debug():
         })
     else:
         conn.current_output_id = None
+        conn.trigger = None
         debug_outputs.pop(output_id, None)
         logger.error("Failed to start debug", extra={'session_id': session_id, 'debug_mode': debug_mode, 'message': message})
         return jsonify({'success': False, 'message': message}), 500
@@ -573,6 +630,8 @@ def stop_debug():
         final_output = conn.get_output()
         debug_outputs[output_id]['output'] = final_output
         debug_outputs[output_id]['end_time'] = datetime.now().isoformat()
+        if conn.trigger:
+            debug_outputs[output_id]['captures'] = conn.trigger.status()['captures']
     
     return jsonify({
         'success': success,
@@ -594,10 +653,14 @@ def get_output():
 
     logger.debug("Serving output", extra={'session_id': session_id, 'lines': len(output)})
 
-    return jsonify({
+    response = {
         'success': True,
         'output': output
-    })
+    }
+    if conn.trigger:
+        response['trigger'] = conn.trigger.status()
+
+    return jsonify(response)
 
 
 @app.route('/api/stats', methods=['GET'])
@@ -679,6 +742,14 @@ def disconnect():
     return jsonify({'success': False, 'message': 'Invalid session ID'}), 400
 
 
+@app.route('/api/session-logs', methods=['GET'])
+def get_session_logs():
+    """List persisted per-session log files"""
+    logs = list_session_logs()
+    logger.debug("Listing session logs", extra={'count': len(logs)})
+    return jsonify({'success': True, 'logs': logs})
+
+
 @app.route('/api/execute-command', methods=['POST'])
 def execute_command():
     """Execute a custom CLI command"""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Telnet transport benchmark
+Streams debug-style output from a local telnet stub through TelnetTransport
+"""
+
+import argparse
+import socket
+import threading
+import time
+
+from telnet_transport import TelnetTransport
+
+IAC, DO, WILL = 255, 253, 251
+ECHO, SGA = 1, 3
+
+
+def run_stub(server, total_bytes, line):
+    """Accept one client, negotiate options, then stream output with embedded IAC bytes"""
+    conn, _ = server.accept()
+    with conn:
+        conn.sendall(bytes([IAC, WILL, ECHO, IAC, WILL, SGA, IAC, DO, SGA]))
+        # Escaped 0xFF data bytes make the transport exercise its IAC path too
+        block = (line + b"\xff\xff\r\n") * max(1, 65536 // (len(line) + 4))
+        sent = 0
+        while sent < total_bytes:
+            conn.sendall(block)
+            sent += len(block)
+        # Drain the client's negotiation replies so close() does not reset the stream
+        conn.shutdown(socket.SHUT_WR)
+        while conn.recv(4096):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark TelnetTransport against a local stub")
+    parser.add_argument('--mb', type=float, default=200, help='Megabytes to stream')
+    args = parser.parse_args()
+
+    total_bytes = int(args.mb * 1024 * 1024)
+    line = b"2024-01-01 00:00:00 [fnbamd_rad.c:1234] fnbamd_rad_process-Result for radius svr 10.0.0.1 0"
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    threading.Thread(target=run_stub, args=(server, total_bytes, line), daemon=True).start()
+
+    client = TelnetTransport('127.0.0.1', server.getsockname()[1])
+    received = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            received += len(client.read_text(timeout=1.0))
+    except EOFError:
+        pass
+    elapsed = time.perf_counter() - start
+    client.close()
+    server.close()
+
+    print(f"Received {received / 1024 / 1024:.1f} MB of text in {elapsed:.2f}s "
+          f"({received / 1024 / 1024 / elapsed:.1f} MB/s)")
+
+
+if __name__ == '__main__':
+    main()
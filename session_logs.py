@@ -0,0 +1,322 @@
+"""
+Per-session log files
+Background writer that batches appends to rotating per-connection logs
+"""
+
+import atexit
+import gzip
+import logging
+import math
+import os
+import queue
+import shutil
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger("fortigate_debug")
+
+SESSION_LOG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'ssh_sessions')
+
+FSYNC_POLICIES = ('none', 'batch', 'close')
+
+
+def _env_number(name, default):
+    """Read a non-negative finite number from the environment, falling back on bad values"""
+    raw = os.environ.get(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = None
+    if value is None or not math.isfinite(value) or value < 0:
+        logger.warning("Ignoring invalid %s=%r, using %s", name, raw, default)
+        return default
+    return value
+
+
+def _env_fsync():
+    raw = os.environ.get('SESSION_LOG_FSYNC', 'close')
+    policy = raw.strip().lower()
+    if policy not in FSYNC_POLICIES:
+        logger.warning("Ignoring invalid SESSION_LOG_FSYNC=%r, expected one of %s; using close",
+                       raw, '|'.join(FSYNC_POLICIES))
+        return 'close'
+    return policy
+
+
+# Per-session log writer settings
+SESSION_LOG_CONFIG = {
+    'max_bytes': int(_env_number('SESSION_LOG_MAX_MB', 50) * 1024 * 1024),
+    'max_seconds': _env_number('SESSION_LOG_MAX_SECONDS', 3600),
+    'compress': os.environ.get('SESSION_LOG_COMPRESS', 'false').lower() in ('1', 'true', 'yes'),
+    'fsync': _env_fsync(),
+    'retention_days': _env_number('SESSION_LOG_RETENTION_DAYS', 0),
+    'flush_interval': _env_number('SESSION_LOG_FLUSH_INTERVAL', 0.5),
+    'queue_size': int(_env_number('SESSION_LOG_QUEUE_SIZE', 10000))
+}
+
+RETENTION_INTERVAL = 3600
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+class SessionLogWriter:
+    """Background writer that batches per-session log appends and rotates files"""
+
+    def __init__(self, log_dir, config):
+        self.log_dir = log_dir
+        self.config = config
+        # Control messages share the queue so they stay ordered with appends,
+        # but only appends count against queue_size and can be dropped
+        self.queue = queue.Queue()
+        self.pending_writes = 0
+        self.dropped = 0
+        self.reserved = set()
+        self.lock = threading.Lock()
+        self.files = {}
+        self.last_cleanup = time.time()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def open(self, name, header):
+        """Reserve a unique log id derived from name and open its file; returns the id"""
+        with self.lock:
+            log_id, suffix = name, 1
+            while log_id in self.reserved or self._exists(log_id):
+                suffix += 1
+                log_id = f"{name}-{suffix}"
+            self.reserved.add(log_id)
+        self.queue.put(('open', log_id, header))
+        return log_id
+
+    def write(self, log_id, data):
+        # Never block the caller on disk; drop and count when the writer falls behind
+        with self.lock:
+            if self.pending_writes >= self.config['queue_size']:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning("Session log queue full, dropped %d entries", self.dropped)
+                return
+            self.pending_writes += 1
+        self.queue.put(('write', log_id, data))
+
+    def close(self, log_id, footer=None):
+        self.queue.put(('close', log_id, footer))
+
+    def shutdown(self):
+        """Drain pending appends and close every open log"""
+        if self.thread is None:
+            return
+        self.queue.put(('shutdown', None, None))
+        self.thread.join(timeout=5)
+
+    def active_logs(self):
+        with self.lock:
+            return {os.path.join(self.log_dir, f"{log_id}.log") for log_id in self.reserved}
+
+    def _exists(self, log_id):
+        path = os.path.join(self.log_dir, f"{log_id}.log")
+        return os.path.exists(path) or os.path.exists(path + '.gz')
+
+    def _run(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        while True:
+            try:
+                batch = [self.queue.get(timeout=self.config['flush_interval'])]
+            except queue.Empty:
+                batch = []
+            while len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            for action, log_id, payload in batch:
+                try:
+                    if action == 'open':
+                        self._open(log_id, payload)
+                    elif action == 'write':
+                        with self.lock:
+                            self.pending_writes -= 1
+                        self._write(log_id, payload)
+                    elif action == 'close':
+                        self._close(log_id, payload)
+                    elif action == 'shutdown':
+                        stop = True
+                except Exception:
+                    logger.exception("Session log %s failed for %s", action, log_id)
+            # Disk errors (e.g. ENOSPC) are logged; the writer must keep running
+            self._flush(fsync=self.config['fsync'] == 'batch')
+            if stop:
+                for log_id in list(self.files):
+                    try:
+                        self._close(log_id)
+                    except Exception:
+                        logger.exception("Session log close failed for %s", log_id)
+                return
+            if time.time() - self.last_cleanup > RETENTION_INTERVAL:
+                try:
+                    self._apply_retention()
+                except Exception:
+                    logger.exception("Session log retention failed")
+
+    def _open(self, log_id, header, segment=1):
+        path = os.path.join(self.log_dir, f"{log_id}.log")
+        f = open(path, 'ab')
+        f.write(f"{header}\nStarted: {datetime.now()}\n{'-' * 60}\n".encode('utf-8'))
+        self.files[log_id] = {
+            'file': f,
+            'path': path,
+            'header': header,
+            'segment': segment,
+            'opened': time.time(),
+            'size': f.tell(),
+            'dirty': True
+        }
+
+    def _write(self, log_id, data):
+        state = self.files.get(log_id)
+        if not state:
+            return
+        if state['file'].closed:
+            # A previous rotation could not open its new segment; retry now
+            self._open(log_id, state['header'], segment=state['segment'])
+            state = self.files[log_id]
+        encoded = data.encode('utf-8')
+        if state['size'] + len(encoded) > self.config['max_bytes'] or time.time() - state['opened'] > self.config['max_seconds']:
+            state = self._rotate(log_id)
+        state['file'].write(encoded)
+        state['size'] += len(encoded)
+        state['dirty'] = True
+
+    def _close(self, log_id, footer=None):
+        state = self.files.pop(log_id, None)
+        try:
+            if state and not state['file'].closed:
+                try:
+                    if footer:
+                        state['file'].write(f"\n{footer}\n".encode('utf-8'))
+                finally:
+                    self._close_file(state)
+                if self.config['compress']:
+                    self._compress(state['path'])
+        finally:
+            with self.lock:
+                self.reserved.discard(log_id)
+
+    def _close_file(self, state):
+        f = state['file']
+        try:
+            f.flush()
+            if self.config['fsync'] != 'none':
+                os.fsync(f.fileno())
+        finally:
+            f.close()
+
+    def _compress(self, path):
+        with open(path, 'rb') as src, gzip.open(path + '.gz', 'wb') as dst:
+            shutil.copyfileobj(src, dst)
+        shutil.copystat(path, path + '.gz')
+        os.remove(path)
+
+    def _rotate(self, log_id):
+        # The old state stays in self.files until _open replaces it, so a
+        # failure here never orphans the session
+        state = self.files[log_id]
+        segment = state['segment']
+        try:
+            self._close_file(state)
+            rotated = os.path.join(self.log_dir, f"{log_id}.{segment}.log")
+            os.replace(state['path'], rotated)
+            segment += 1
+            logger.debug("Rotated session log %s (segment %d)", log_id, state['segment'])
+            if self.config['compress']:
+                self._compress(rotated)
+        except OSError:
+            logger.exception("Session log rotation failed for %s", log_id)
+        self._open(log_id, state['header'], segment=segment)
+        return self.files[log_id]
+
+    def _flush(self, fsync=False):
+        for log_id, state in list(self.files.items()):
+            if not state['dirty'] or state['file'].closed:
+                continue
+            try:
+                state['file'].flush()
+                if fsync:
+                    os.fsync(state['file'].fileno())
+                state['dirty'] = False
+            except OSError:
+                logger.exception("Session log flush failed for %s", log_id)
+
+    def _apply_retention(self):
+        self.last_cleanup = time.time()
+        if self.config['retention_days'] <= 0:
+            return
+        cutoff = self.last_cleanup - self.config['retention_days'] * 86400
+        active = self.active_logs()
+        for name in os.listdir(self.log_dir):
+            path = os.path.join(self.log_dir, name)
+            if path in active or not name.endswith(('.log', '.log.gz')):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    logger.info("Removed expired session log %s", name)
+            except OSError:
+                logger.exception("Failed to apply retention to %s", path)
+
+
+def get_session_log_writer():
+    """Return the shared writer, starting its thread on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SessionLogWriter(SESSION_LOG_DIR, SESSION_LOG_CONFIG).start()
+            atexit.register(_writer.shutdown)
+        return _writer
+
+
+def list_session_logs(log_dir=SESSION_LOG_DIR, writer=None):
+    """Describe the session log files on disk with their sizes and time ranges"""
+    logs = []
+    if not os.path.isdir(log_dir):
+        return logs
+    writer = writer or _writer
+    active = writer.active_logs() if writer else set()
+    for name in os.listdir(log_dir):
+        if not name.endswith(('.log', '.log.gz')):
+            continue
+        path = os.path.join(log_dir, name)
+        try:
+            stat = os.stat(path)
+            opener = gzip.open if name.endswith('.gz') else open
+            started = None
+            with opener(path, 'rt', encoding='utf-8', errors='ignore') as f:
+                for _ in range(3):
+                    line = f.readline()
+                    if line.startswith('Started: '):
+                        started = datetime.fromisoformat(line[len('Started: '):].strip()).isoformat()
+                        break
+        except (OSError, ValueError):
+            logger.exception("Failed to read session log %s", name)
+            continue
+        is_active = path in active
+        logs.append({
+            'name': name,
+            'size': stat.st_size,
+            'compressed': name.endswith('.gz'),
+            'active': is_active,
+            'start_time': started,
+            'end_time': None if is_active else datetime.fromtimestamp(stat.st_mtime).isoformat()
+        })
+    logs.sort(key=lambda entry: entry['start_time'] or '', reverse=True)
+    return logs
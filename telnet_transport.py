@@ -0,0 +1,182 @@
+"""
+Telnet transport
+Telnet client on a non-blocking socket, replacing the removed telnetlib module
+"""
+
+import codecs
+import selectors
+import socket
+import time
+
+
+class TelnetTransport:
+    """Telnet client on a non-blocking socket with IAC negotiation handling"""
+
+    IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+    ECHO, SGA = 1, 3
+    # Options we let the device enable on its side, and ones we enable on ours
+    ACCEPT_REMOTE = {ECHO, SGA}
+    ACCEPT_LOCAL = {SGA}
+
+    def __init__(self, host, port, timeout=10, recv_size=262144, encoding='utf-8'):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.recv_size = recv_size
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setblocking(False)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self.encoding = encoding
+        self.state = 'data'
+        self.command = None
+        self.remote_options = set()
+        self.local_options = set()
+        self.pending = bytearray()
+        self.cr_pending = False
+        self.eof = False
+
+    def read_available(self, timeout=0.0):
+        """Wait up to timeout for the socket to become readable, then drain it"""
+        if self.pending:
+            data, self.pending = bytes(self.pending), bytearray()
+            return data
+        if self.eof:
+            raise EOFError("Telnet connection closed")
+        if not self.selector.select(timeout):
+            return b''
+        chunks = []
+        while True:
+            try:
+                chunk = self.sock.recv(self.recv_size)
+            except (BlockingIOError, InterruptedError):
+                break
+            if not chunk:
+                self.eof = True
+                break
+            chunks.append(self._process(chunk))
+            if len(chunk) < self.recv_size:
+                break
+        data = b''.join(chunks)
+        if not data and self.eof:
+            raise EOFError("Telnet connection closed")
+        return data
+
+    def read_text(self, timeout=0.0):
+        """Read available output as text, keeping multi-byte characters intact across reads"""
+        return self.decoder.decode(self.read_available(timeout))
+
+    def read_until(self, expected, timeout=None):
+        """Read until expected bytes are seen or timeout elapses; returns what was read"""
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        buffer = bytearray()
+        while True:
+            index = buffer.find(expected)
+            if index >= 0:
+                end = index + len(expected)
+                self.pending[:0] = buffer[end:]
+                return bytes(buffer[:end])
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return bytes(buffer)
+            buffer += self.read_available(remaining)
+
+    def write(self, data):
+        """Send bytes, escaping IAC and waiting for writability instead of blocking"""
+        if isinstance(data, str):
+            data = data.encode(self.encoding)
+        self._send(data.replace(bytes([self.IAC]), bytes([self.IAC, self.IAC])))
+
+    def close(self):
+        try:
+            self.selector.close()
+        finally:
+            self.sock.close()
+
+    def _send(self, data):
+        view = memoryview(data)
+        deadline = time.monotonic() + self.timeout
+        with selectors.DefaultSelector() as writable:
+            writable.register(self.sock, selectors.EVENT_WRITE)
+            while view:
+                try:
+                    sent = self.sock.send(view)
+                    view = view[sent:]
+                except (BlockingIOError, InterruptedError):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not writable.select(remaining):
+                        raise TimeoutError("Telnet write timed out")
+
+    def _process(self, chunk):
+        """Strip telnet commands from a chunk, answering option negotiation"""
+        if self.state == 'data' and self.IAC not in chunk:
+            return self._strip_cr_nul(chunk)
+        out = bytearray()
+        i = 0
+        length = len(chunk)
+        while i < length:
+            if self.state == 'data':
+                index = chunk.find(self.IAC, i)
+                if index < 0:
+                    out += chunk[i:]
+                    break
+                out += chunk[i:index]
+                self.state = 'iac'
+                i = index + 1
+                continue
+            byte = chunk[i]
+            i += 1
+            if self.state == 'iac':
+                if byte == self.IAC:
+                    out.append(self.IAC)
+                    self.state = 'data'
+                elif byte in (self.DO, self.DONT, self.WILL, self.WONT):
+                    self.command = byte
+                    self.state = 'option'
+                elif byte == self.SB:
+                    self.state = 'sb'
+                else:
+                    self.state = 'data'
+            elif self.state == 'option':
+                self._negotiate(self.command, byte)
+                self.state = 'data'
+            elif self.state == 'sb':
+                if byte == self.IAC:
+                    self.state = 'sb_iac'
+            elif self.state == 'sb_iac':
+                self.state = 'data' if byte == self.SE else 'sb'
+        return self._strip_cr_nul(bytes(out))
+
+    def _strip_cr_nul(self, data):
+        """Collapse NVT CR NUL to CR, including pairs split across reads"""
+        if self.cr_pending and data[:1] == b'\x00':
+            data = data[1:]
+        if data:
+            self.cr_pending = data[-1:] == b'\r'
+        return data.replace(b'\r\x00', b'\r')
+
+    def _negotiate(self, command, option):
+        # Only reply when our view of the option changes, so negotiation cannot loop
+        if command == self.WILL:
+            if option in self.ACCEPT_REMOTE:
+                if option not in self.remote_options:
+                    self.remote_options.add(option)
+                    self._send(bytes([self.IAC, self.DO, option]))
+            else:
+                self._send(bytes([self.IAC, self.DONT, option]))
+        elif command == self.WONT:
+            if option in self.remote_options:
+                self.remote_options.discard(option)
+                self._send(bytes([self.IAC, self.DONT, option]))
+        elif command == self.DO:
+            if option in self.ACCEPT_LOCAL:
+                if option not in self.local_options:
+                    self.local_options.add(option)
+                    self._send(bytes([self.IAC, self.WILL, option]))
+            else:
+                self._send(bytes([self.IAC, self.WONT, option]))
+        elif command == self.DONT:
+            if option in self.local_options:
+                self.local_options.discard(option)
+                self._send(bytes([self.IAC, self.WONT, option]))
@@ -0,0 +1,196 @@
+import gzip
+import os
+import time
+
+import session_logs
+from session_logs import SessionLogWriter, list_session_logs
+
+
+def make_config(**overrides):
+    config = {
+        'max_bytes': 1024 * 1024,
+        'max_seconds': 3600,
+        'compress': False,
+        'fsync': 'none',
+        'retention_days': 0,
+        'flush_interval': 0.05,
+        'queue_size': 100
+    }
+    config.update(overrides)
+    return config
+
+
+def test_import_does_not_start_writer():
+    assert session_logs._writer is None
+
+
+def test_same_name_gets_unique_log_ids(tmp_path):
+    writer = SessionLogWriter(str(tmp_path), make_config()).start()
+    first = writer.open('10.0.0.1_ssh_20240101-000000', 'SSH Connection: a@10.0.0.1:22')
+    second = writer.open('10.0.0.1_ssh_20240101-000000', 'SSH Connection: b@10.0.0.1:22')
+    writer.write(first, 'from first\n')
+    writer.write(second, 'from second\n')
+    writer.close(first)
+    writer.close(second)
+    writer.shutdown()
+
+    assert first != second
+    assert 'from first' in (tmp_path / f'{first}.log').read_text()
+    assert 'from second' in (tmp_path / f'{second}.log').read_text()
+    assert 'from second' not in (tmp_path / f'{first}.log').read_text()
+    # A later session with the same name must not reuse a closed log's file
+    assert writer.open('10.0.0.1_ssh_20240101-000000', 'x') not in (first, second)
+
+
+def test_rotation_counts_encoded_bytes_and_compresses_every_segment(tmp_path):
+    writer = SessionLogWriter(str(tmp_path), make_config(max_bytes=400, compress=True)).start()
+    log_id = writer.open('dev_telnet_1', 'TELNET Connection: admin@dev:23')
+    line = 'é' * 50 + '\n'  # 101 bytes, 51 characters
+    for _ in range(6):
+        writer.write(log_id, line)
+    writer.close(log_id, '[Session closed]')
+    writer.shutdown()
+
+    names = sorted(os.listdir(tmp_path))
+    assert f'{log_id}.log.gz' in names
+    assert f'{log_id}.1.log.gz' in names
+    assert not [name for name in names if name.endswith('.log')]
+    for name in names:
+        assert os.path.getsize(tmp_path / name) > 0
+        with gzip.open(tmp_path / name, 'rb') as f:
+            assert len(f.read()) <= 400
+    with gzip.open(tmp_path / f'{log_id}.log.gz', 'rt', encoding='utf-8') as f:
+        assert f.read().endswith('[Session closed]\n')
+
+
+def test_full_queue_drops_appends_but_not_open_or_close(tmp_path):
+    writer = SessionLogWriter(str(tmp_path), make_config(queue_size=2))
+    log_id = writer.open('dev_ssh_1', 'SSH Connection: admin@dev:22')
+    for i in range(5):
+        writer.write(log_id, f'line {i}\n')
+    writer.close(log_id, '[Session closed]')
+    writer.start()
+    writer.shutdown()
+
+    content = (tmp_path / f'{log_id}.log').read_text()
+    assert writer.dropped == 3
+    assert 'line 1' in content and 'line 2' not in content
+    assert content.endswith('[Session closed]\n')
+    assert writer.active_logs() == set()
+    assert writer.files == {}
+
+
+def test_retention_is_off_by_default_and_deferred(tmp_path):
+    old = tmp_path / 'old_ssh_1.log'
+    old.write_text('Started: 2020-01-01 00:00:00\n')
+    os.utime(old, (0, 0))
+
+    writer = SessionLogWriter(str(tmp_path), make_config(retention_days=1))
+    writer.start()
+    time.sleep(0.2)
+    writer.shutdown()
+    assert old.exists()
+    if 'SESSION_LOG_RETENTION_DAYS' not in os.environ:
+        assert session_logs.SESSION_LOG_CONFIG['retention_days'] == 0
+
+    writer = SessionLogWriter(str(tmp_path), make_config(retention_days=1))
+    active_id = writer.open('active_ssh_1', 'SSH Connection: admin@dev:22')
+    (tmp_path / f'{active_id}.log').write_text('')
+    os.utime(tmp_path / f'{active_id}.log', (0, 0))
+    writer._apply_retention()
+    assert not old.exists()
+    assert (tmp_path / f'{active_id}.log').exists()
+
+    writer = SessionLogWriter(str(tmp_path), make_config(retention_days=0))
+    old.write_text('')
+    os.utime(old, (0, 0))
+    writer._apply_retention()
+    assert old.exists()
+
+
+def test_list_session_logs_reports_sizes_and_time_ranges(tmp_path):
+    writer = SessionLogWriter(str(tmp_path), make_config()).start()
+    closed_id = writer.open('dev_ssh_1', 'SSH Connection: admin@dev:22')
+    writer.write(closed_id, 'output\n')
+    writer.close(closed_id)
+    open_id = writer.open('dev_ssh_2', 'SSH Connection: admin@dev:22')
+    deadline = time.time() + 2
+    while not (tmp_path / f'{open_id}.log').exists() and time.time() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.1)
+
+    logs = {entry['name']: entry for entry in list_session_logs(str(tmp_path), writer)}
+    writer.shutdown()
+
+    closed = logs[f'{closed_id}.log']
+    assert closed['active'] is False
+    assert closed['size'] == os.path.getsize(tmp_path / f'{closed_id}.log')
+    assert closed['start_time'] and closed['end_time']
+    assert logs[f'{open_id}.log']['active'] is True
+    assert logs[f'{open_id}.log']['end_time'] is None
+
+
+def fail_once(monkeypatch, name):
+    """Make session_logs.os.<name> raise ENOSPC on its first call only"""
+    original = getattr(os, name)
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OSError(28, 'No space left on device')
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(session_logs.os, name, flaky)
+    return calls
+
+
+def test_writer_survives_flush_error(tmp_path, monkeypatch):
+    calls = fail_once(monkeypatch, 'fsync')
+    writer = SessionLogWriter(str(tmp_path), make_config(fsync='batch')).start()
+    log_id = writer.open('dev_ssh_1', 'SSH Connection: admin@dev:22')
+    writer.write(log_id, 'first\n')
+    deadline = time.time() + 2
+    while not calls and time.time() < deadline:
+        time.sleep(0.01)
+    writer.write(log_id, 'second\n')
+    writer.close(log_id)
+    writer.shutdown()
+
+    assert calls
+    assert not writer.thread.is_alive()  # exited via shutdown, not the error
+    assert 'second' in (tmp_path / f'{log_id}.log').read_text()
+    assert writer.active_logs() == set()
+
+
+def test_failed_rotation_keeps_session_logging(tmp_path, monkeypatch):
+    fail_once(monkeypatch, 'replace')
+    writer = SessionLogWriter(str(tmp_path), make_config(max_bytes=200)).start()
+    log_id = writer.open('dev_ssh_1', 'SSH Connection: admin@dev:22')
+    for i in range(6):
+        writer.write(log_id, f'line {i} ' + 'x' * 40 + '\n')
+    writer.close(log_id, '[Session closed]')
+    writer.shutdown()
+
+    content = ''.join(path.read_text() for path in sorted(tmp_path.iterdir()))
+    for i in range(6):
+        assert f'line {i} ' in content
+    assert content.count('[Session closed]') == 1
+    assert writer.active_logs() == set()
+    assert writer.files == {}
+
+
+def test_invalid_env_values_fall_back(monkeypatch, caplog):
+    monkeypatch.setenv('SESSION_LOG_MAX_MB', 'fifty')
+    monkeypatch.setenv('SESSION_LOG_QUEUE_SIZE', 'inf')
+    monkeypatch.setenv('SESSION_LOG_FLUSH_INTERVAL', '-1')
+    assert session_logs._env_number('SESSION_LOG_MAX_MB', 50) == 50
+    assert session_logs._env_number('SESSION_LOG_QUEUE_SIZE', 10000) == 10000
+    assert session_logs._env_number('SESSION_LOG_FLUSH_INTERVAL', 0.5) == 0.5
+    assert 'SESSION_LOG_MAX_MB' in caplog.text
+
+    monkeypatch.setenv('SESSION_LOG_FSYNC', ' Batch ')
+    assert session_logs._env_fsync() == 'batch'
+    monkeypatch.setenv('SESSION_LOG_FSYNC', 'always')
+    assert session_logs._env_fsync() == 'close'
+    assert 'SESSION_LOG_FSYNC' in caplog.text
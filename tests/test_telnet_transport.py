@@ -0,0 +1,117 @@
+import socket
+import time
+
+import pytest
+
+from telnet_transport import TelnetTransport
+
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+
+
+@pytest.fixture
+def pair():
+    """A TelnetTransport connected to the server side of a local socket"""
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(('127.0.0.1', 0))
+    server.listen(1)
+    client = TelnetTransport('127.0.0.1', server.getsockname()[1], timeout=2)
+    peer, _ = server.accept()
+    peer.settimeout(2)
+    yield client, peer
+    client.close()
+    peer.close()
+    server.close()
+
+
+def send_chunks(client, peer, *chunks):
+    """Deliver each chunk as a separate read so sequences are split across recv calls"""
+    data = b''
+    for chunk in chunks:
+        peer.sendall(chunk)
+        time.sleep(0.05)
+        data += client.read_available(timeout=1)
+    return data
+
+
+def recv_exactly(peer, size):
+    data = b''
+    while len(data) < size:
+        data += peer.recv(size - len(data))
+    return data
+
+
+def test_plain_data_passes_through(pair):
+    client, peer = pair
+    assert send_chunks(client, peer, b'diagnose debug\r\n') == b'diagnose debug\r\n'
+
+
+def test_negotiation_split_across_chunks(pair):
+    client, peer = pair
+    assert send_chunks(client, peer, b'ab' + bytes([IAC]), bytes([WILL]), bytes([1]) + b'cd') == b'abcd'
+    assert recv_exactly(peer, 3) == bytes([IAC, DO, 1])
+
+
+def test_escaped_iac_split_across_chunks(pair):
+    client, peer = pair
+    assert send_chunks(client, peer, b'x' + bytes([IAC]), bytes([IAC]) + b'y') == b'x\xffy'
+
+
+def test_subnegotiation_is_stripped(pair):
+    client, peer = pair
+    data = send_chunks(
+        client, peer,
+        b'a' + bytes([IAC, SB, 24]),
+        bytes([1, IAC, IAC, 5, IAC]),
+        bytes([SE]) + b'b'
+    )
+    assert data == b'ab'
+
+
+def test_cr_nul_split_across_chunks(pair):
+    client, peer = pair
+    assert send_chunks(client, peer, b'line\r', b'\x00next\r\x00end') == b'line\rnext\rend'
+
+
+def test_unsupported_options_are_refused_once(pair):
+    client, peer = pair
+    send_chunks(client, peer, bytes([IAC, DO, 24, IAC, WILL, 1, IAC, WILL, 1, IAC, DO, 3, IAC, DO, 3]))
+    assert recv_exactly(peer, 9) == bytes([IAC, WONT, 24, IAC, DO, 1, IAC, WILL, 3])
+    peer.settimeout(0.1)
+    with pytest.raises(socket.timeout):
+        peer.recv(1)
+
+
+def test_utf8_split_across_reads_decodes_intact(pair):
+    client, peer = pair
+    encoded = 'Password: é'.encode('utf-8')
+    peer.sendall(encoded[:-1])
+    time.sleep(0.05)
+    first = client.read_text(timeout=1)
+    peer.sendall(encoded[-1:])
+    time.sleep(0.05)
+    assert first + client.read_text(timeout=1) == 'Password: é'
+
+
+def test_write_encodes_utf8_and_escapes_iac(pair):
+    client, peer = pair
+    client.write('usér\n')
+    client.write(b'\xff')
+    assert recv_exactly(peer, 8) == 'usér\n'.encode('utf-8') + bytes([IAC, IAC])
+
+
+def test_read_until_keeps_remainder_and_eof_after_pending(pair):
+    client, peer = pair
+    peer.sendall(b'FGT login: rest')
+    peer.close()
+    assert client.read_until(b'login: ', timeout=1) == b'FGT login: '
+    assert client.read_available(timeout=1) == b'rest'
+    with pytest.raises(EOFError):
+        client.read_available(timeout=1)
+
+
+def test_read_until_times_out_with_partial_data(pair):
+    client, peer = pair
+    peer.sendall(b'Passw')
+    start = time.monotonic()
+    assert client.read_until(b'Password: ', timeout=0.2) == b'Passw'
+    assert time.monotonic() - start < 1
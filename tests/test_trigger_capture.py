@@ -0,0 +1,167 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+import trigger_capture
+from trigger_capture import TriggerCapture, validate_webhook_url
+
+
+@pytest.fixture(autouse=True)
+def capture_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(trigger_capture, 'TRIGGER_CAPTURE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def make_trigger(**overrides):
+    config = {'pattern': 'negotiation failure', 'post_trigger_seconds': 60}
+    config.update(overrides)
+    return TriggerCapture.from_config('out1', config)
+
+
+def feed(trigger, data):
+    trigger.feed(f"[ts] {data}", data)
+
+
+def wait_for(path, timeout=2):
+    deadline = time.time() + timeout
+    while not path.exists() and time.time() < deadline:
+        time.sleep(0.01)
+    return path.read_text()
+
+
+def test_ring_is_bounded_while_armed():
+    trigger = make_trigger(pre_trigger_mb=0.0001)
+    for i in range(1000):
+        feed(trigger, f"line {i}\n")
+    status = trigger.status()
+    assert status['state'] == 'armed'
+    assert status['buffered_bytes'] <= 0.0001 * 1024 * 1024
+    assert trigger.get_output()[-1] == "[ts] line 999\n"
+
+
+def test_match_split_across_chunks_saves_pre_and_post_window(capture_dir):
+    trigger = make_trigger()
+    feed(trigger, "before\n")
+    feed(trigger, "ike negotiation fai")
+    assert trigger.state == 'armed'
+    feed(trigger, "lure\n")
+    assert trigger.state == 'capturing'
+    feed(trigger, "after\n")
+    trigger.flush()
+
+    content = wait_for(capture_dir / 'out1_trigger1.log')
+    body = content.split('\n', 1)[1]
+    assert body == "[ts] before\n\n[ts] ike negotiation fai\n[ts] lure\n\n[ts] after\n\n"
+    assert trigger.status()['captures'][0]['match'] == 'negotiation failure'
+
+
+def test_matching_chunk_is_kept_with_zero_pre_window(capture_dir):
+    trigger = make_trigger(pre_trigger_mb=0)
+    feed(trigger, "noise\n")
+    feed(trigger, "ike negotiation failure\n")
+    feed(trigger, "after\n")
+    trigger.flush()
+
+    content = wait_for(capture_dir / 'out1_trigger1.log')
+    assert 'noise' not in content
+    assert 'ike negotiation failure' in content
+    assert 'after' in content
+
+
+def test_post_window_closes_on_poll(capture_dir):
+    trigger = make_trigger(post_trigger_seconds=0.05, max_captures=1)
+    feed(trigger, "negotiation failure\n")
+    time.sleep(0.1)
+    trigger.poll()
+    assert trigger.state == 'done'
+    wait_for(capture_dir / 'out1_trigger1.log')
+
+
+def test_unlimited_captures_keep_memory_bounded(capture_dir):
+    trigger = make_trigger(max_captures=0, post_trigger_mb=0.00001)
+    for i in range(1000):
+        feed(trigger, f"negotiation failure {i}\n")
+        feed(trigger, f"post {i}\n")
+
+    status = trigger.status()
+    assert status['state'] == 'armed'
+    assert status['capture_count'] == 1000
+    assert len(status['captures']) <= trigger_capture.MAX_CAPTURE_HISTORY
+    assert len(trigger.get_output()) <= 3
+    wait_for(capture_dir / 'out1_trigger1000.log')
+
+
+@pytest.mark.parametrize('overrides', [
+    {'max_captures': 'inf'},
+    {'post_trigger_mb': 1e308},
+    {'pre_trigger_mb': 'nan'},
+    {'post_trigger_seconds': float('nan')},
+    {'pre_trigger_seconds': '-inf'},
+    {'post_trigger_mb': -1},
+])
+def test_rejects_non_finite_or_negative_limits(overrides):
+    with pytest.raises(ValueError):
+        make_trigger(**overrides)
+
+
+def test_limits_count_encoded_bytes():
+    trigger = make_trigger(pre_trigger_mb=100 / (1024 * 1024))
+    for _ in range(10):
+        feed(trigger, 'é' * 20)  # 45 bytes once encoded, 25 characters
+    status = trigger.status()
+    assert status['buffered_bytes'] == 90
+    assert len(trigger.get_output()) == 2
+
+
+@pytest.mark.parametrize('url', [
+    'http://127.0.0.1:9000/hook',
+    'https://localhost/hook',
+    'http://[::1]:8080/',
+])
+def test_webhook_allows_loopback(url):
+    assert make_trigger(webhook_url=url).webhook_url == url
+
+
+@pytest.mark.parametrize('url', [
+    'http://example.com/hook',
+    'http://10.0.0.5/hook',
+    'file:///etc/passwd',
+    'ftp://127.0.0.1/hook',
+])
+def test_webhook_rejects_other_targets(url):
+    with pytest.raises(ValueError):
+        make_trigger(webhook_url=url)
+
+
+def test_webhook_allow_list(monkeypatch):
+    monkeypatch.setattr(trigger_capture, 'TRIGGER_WEBHOOK_ALLOWED_HOSTS', {'hooks.internal'})
+    assert validate_webhook_url('https://hooks.internal/x')
+
+
+def test_webhook_receives_capture_metadata():
+    received = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            received.append(json.loads(self.rfile.read(int(self.headers['Content-Length']))))
+            self.send_response(204)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.handle_request, daemon=True).start()
+    trigger = make_trigger(webhook_url=f"http://127.0.0.1:{server.server_port}/hook")
+    feed(trigger, "negotiation failure\n")
+    trigger.flush()
+
+    deadline = time.time() + 2
+    while not received and time.time() < deadline:
+        time.sleep(0.01)
+    server.server_close()
+    assert received[0]['output_id'] == 'out1'
+    assert received[0]['number'] == 1
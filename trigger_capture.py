@@ -0,0 +1,220 @@
+"""
+Trigger-based capture
+Bounded pre-trigger ring buffer that persists output windows around a regex match
+"""
+
+import ipaddress
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import deque
+from datetime import datetime
+
+logger = logging.getLogger("fortigate_debug")
+
+TRIGGER_CAPTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'triggers')
+
+# Trigger capture defaults (overridable per debug session)
+TRIGGER_DEFAULTS = {
+    'pre_trigger_mb': 4,
+    'pre_trigger_seconds': 60,
+    'post_trigger_mb': 4,
+    'post_trigger_seconds': 30,
+    'max_captures': 5
+}
+
+# Webhooks may only target loopback or these extra hosts (comma-separated)
+TRIGGER_WEBHOOK_ALLOWED_HOSTS = {
+    host.strip().lower()
+    for host in os.environ.get('TRIGGER_WEBHOOK_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+}
+
+# Metadata entries kept for status reporting; capture contents live on disk
+MAX_CAPTURE_HISTORY = 100
+
+
+def validate_webhook_url(url):
+    """Reject webhook URLs that are not http(s) to loopback or an allow-listed host"""
+    parsed = urllib.parse.urlsplit(url)
+    if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+        raise ValueError("Webhook URL must be an http or https URL")
+    host = parsed.hostname.lower()
+    if host == 'localhost' or host in TRIGGER_WEBHOOK_ALLOWED_HOSTS:
+        return url
+    try:
+        if ipaddress.ip_address(host).is_loopback:
+            return url
+    except ValueError:
+        pass
+    raise ValueError(f"Webhook host {host} is not loopback or in TRIGGER_WEBHOOK_ALLOWED_HOSTS")
+
+
+class TriggerCapture:
+    """Pre-trigger ring buffer that persists output windows around a regex match"""
+
+    def __init__(self, output_id, pattern, pre_trigger_mb, pre_trigger_seconds,
+                 post_trigger_mb, post_trigger_seconds, max_captures, webhook_url=None):
+        self.output_id = output_id
+        self.pattern = re.compile(pattern)
+        self.pre_bytes = int(pre_trigger_mb * 1024 * 1024)
+        self.pre_seconds = pre_trigger_seconds
+        self.post_bytes = int(post_trigger_mb * 1024 * 1024)
+        self.post_seconds = post_trigger_seconds
+        self.max_captures = max_captures
+        self.webhook_url = webhook_url
+        self.ring = deque()
+        self.ring_bytes = 0
+        self.tail = ''
+        # Holds only the open capture, or the most recent one once it is persisted
+        self.output = []
+        self.captures = deque(maxlen=MAX_CAPTURE_HISTORY)
+        self.capture_count = 0
+        self.capture = None
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, output_id, config):
+        """Build a trigger from the request payload, applying defaults"""
+        if not isinstance(config, dict) or not config.get('pattern'):
+            raise ValueError("Trigger pattern is required")
+        options = {key: float(config.get(key, default)) for key, default in TRIGGER_DEFAULTS.items()}
+        for key, value in options.items():
+            # Also rejects sizes that overflow once converted to bytes
+            scaled = value * 1024 * 1024 if key.endswith('_mb') else value
+            if not math.isfinite(scaled):
+                raise ValueError(f"Trigger {key} must be a finite number")
+            if value < 0:
+                raise ValueError("Trigger limits must not be negative")
+        options['max_captures'] = int(options['max_captures'])
+        webhook_url = config.get('webhook_url') or None
+        if webhook_url:
+            validate_webhook_url(str(webhook_url))
+        return cls(output_id, config['pattern'], webhook_url=webhook_url, **options)
+
+    @property
+    def state(self):
+        if self.capture:
+            return 'capturing'
+        if self.max_captures and self.capture_count >= self.max_captures:
+            return 'done'
+        return 'armed'
+
+    def feed(self, formatted, data):
+        """Route one chunk of device output through the ring or the open capture"""
+        now = time.monotonic()
+        with self.lock:
+            if self.capture:
+                self._append_capture(formatted)
+            elif self.state == 'armed':
+                match = self.pattern.search(self.tail + data)
+                self.tail = (self.tail + data).rsplit('\n', 1)[-1][-4096:]
+                size = len(formatted.encode('utf-8'))
+                if match:
+                    # The matching chunk goes straight into the capture so ring
+                    # eviction can never drop it
+                    self._open_capture(match.group(0), now)
+                    self.output.append(formatted)
+                    self.capture['bytes'] += size
+                else:
+                    self._append_ring(formatted, size, now)
+            self._check_window(now)
+
+    def poll(self):
+        """Close the post-trigger window once it has elapsed, even on a quiet stream"""
+        with self.lock:
+            self._check_window(time.monotonic())
+
+    def flush(self):
+        """Persist any capture still open when monitoring stops"""
+        with self.lock:
+            if self.capture:
+                self._close_capture()
+
+    def get_output(self):
+        with self.lock:
+            return self.output + [line for _, line, _ in self.ring]
+
+    def status(self):
+        with self.lock:
+            return {
+                'pattern': self.pattern.pattern,
+                'state': self.state,
+                'buffered_bytes': self.ring_bytes,
+                'capture_count': self.capture_count,
+                'captures': [dict(c) for c in self.captures]
+            }
+
+    def _append_ring(self, formatted, size, now):
+        self.ring.append((now, formatted, size))
+        self.ring_bytes += size
+        while self.ring and (self.ring_bytes > self.pre_bytes or now - self.ring[0][0] > self.pre_seconds):
+            _, _, dropped = self.ring.popleft()
+            self.ring_bytes -= dropped
+
+    def _append_capture(self, formatted):
+        size = len(formatted.encode('utf-8'))
+        self.output.append(formatted)
+        self.capture['bytes'] += size
+        self.capture['post_bytes'] += size
+
+    def _open_capture(self, matched, now):
+        self.capture_count += 1
+        number = self.capture_count
+        triggered_at = datetime.now().isoformat()
+        logger.info("Trigger #%d matched for %s: %s", number, self.output_id, matched)
+        # Earlier captures are already on disk; keep only the new one in memory
+        self.output = [f"===== Trigger #{number} matched at {triggered_at}: {matched} ====="]
+        self.capture = {
+            'deadline': now + self.post_seconds,
+            'bytes': 0,
+            'post_bytes': 0,
+            'meta': {'number': number, 'triggered_at': triggered_at, 'match': matched}
+        }
+        for _, line, size in self.ring:
+            self.output.append(line)
+            self.capture['bytes'] += size
+        self.ring.clear()
+        self.ring_bytes = 0
+        self.tail = ''
+
+    def _check_window(self, now):
+        if self.capture and (now >= self.capture['deadline'] or self.capture['post_bytes'] >= self.post_bytes):
+            self._close_capture()
+
+    def _close_capture(self):
+        capture, self.capture = self.capture, None
+        meta = capture['meta']
+        meta['completed_at'] = datetime.now().isoformat()
+        meta['bytes'] = capture['bytes']
+        meta['file'] = os.path.join(TRIGGER_CAPTURE_DIR, f"{self.output_id}_trigger{meta['number']}.log")
+        self.captures.append(meta)
+        threading.Thread(target=self._persist, args=(dict(meta), list(self.output)), daemon=True).start()
+
+    def _persist(self, meta, lines):
+        """Write a finished capture to disk and notify the webhook, off the monitor thread"""
+        try:
+            os.makedirs(TRIGGER_CAPTURE_DIR, exist_ok=True)
+            with open(meta['file'], 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            logger.info("Saved trigger capture %s (%d bytes)", meta['file'], meta['bytes'])
+        except OSError:
+            logger.exception("Failed to save trigger capture %s", meta['file'])
+        if self.webhook_url:
+            payload = dict(meta, output_id=self.output_id, pattern=self.pattern.pattern)
+            req = urllib.request.Request(
+                self.webhook_url,
+                data=json.dumps(payload).encode('utf-8'),
+                headers={'Content-Type': 'application/json'},
+                method='POST'
+            )
+            try:
+                urllib.request.urlopen(req, timeout=5).close()
+            except Exception:
+                logger.warning("Trigger webhook failed for %s", self.webhook_url, exc_info=True)